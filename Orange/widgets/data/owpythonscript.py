@@ -1,11 +1,12 @@
 import sys
 import os
 import code
+import mmap
 import keyword
 import itertools
 import unicodedata
 import weakref
-from functools import reduce
+from functools import lru_cache, reduce
 from unittest.mock import patch
 
 from typing import Optional, List, Dict, Any, TYPE_CHECKING
@@ -60,11 +61,83 @@ def text_format(foreground=Qt.black, weight=QFont.Normal):
     return fmt
 
 
-def read_file_content(filename, limit=None):
+# below this size the setup cost of mmap outweighs the saved copy
+MMAP_THRESHOLD = 1 << 14
+
+# magic numbers of common binary formats (ELF, zip, PNG, PE); files that
+# start with one of these cannot be a text script
+BINARY_MAGIC = (b"\x7fELF", b"PK\x03\x04", b"\x89PNG", b"MZ")
+
+# control bytes that do not appear in text files; whitespace controls
+# (tab, LF, VT, FF, CR) and ESC are legitimate and excluded
+BINARY_CONTROL = bytes(b for b in range(0x20)
+                       if b not in (0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x1B))
+
+
+def looks_binary(head):
+    """
+    Heuristically decide whether the head of a file is binary content.
+    """
+    # translate with a deletion table is a single C-level pass over the
+    # head; any removed byte means a control byte was present
+    return (head.startswith(BINARY_MAGIC)
+            or len(head.translate(None, BINARY_CONTROL)) != len(head))
+
+# size of the window inspected when only an accept/reject decision is
+# needed (`head_only`); large enough to catch non-text content
+HEAD_SIZE = 8192
+
+
+def _decode_head(data):
+    # the window may be cut in the middle of a UTF-8 sequence; treat a
+    # truncated trailing sequence as valid and decode up to it
+    try:
+        return data.decode("utf-8", errors="strict")
+    except UnicodeDecodeError as err:
+        if err.start >= len(data) - 3:
+            return data[:err.start].decode("utf-8", errors="strict")
+        raise
+
+
+@lru_cache(maxsize=16)
+def _read_and_decode(filename, _mtime_ns, size, head_only):
+    # _mtime_ns and size are part of the cache key, so a file modified
+    # between two reads is decoded anew; decode errors are not cached
+    # and propagate to the caller
+
+    # read raw bytes and validate/decode them in one bulk call instead
+    # of going through the incremental decoder of a text-mode stream
+    with open(filename, "rb") as f:
+        if head_only:
+            # the caller only decides whether the file looks like text,
+            # so validating the head suffices
+            return _decode_head(f.read(HEAD_SIZE))
+        if size >= MMAP_THRESHOLD:
+            # decode straight from the OS page cache instead of first
+            # copying the file into an intermediate bytes object; note
+            # that QFile.map would map the file just the same, but its
+            # content would then be copied when crossing into Python,
+            # so the stdlib mapping is the zero-copy option here
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return str(view, "utf-8", "strict")
+        data = f.read()
+        if data.isascii():
+            # pure-ASCII source (the common case for dropped scripts)
+            # needs no multi-byte validation at all
+            return data.decode("ascii")
+        return data.decode("utf-8", errors="strict")
+
+
+def read_file_content(filename, limit=None, head_only=False):
     try:
-        with open(filename, encoding="utf-8", errors='strict') as f:
-            text = f.read(limit)
-            return text
+        stat = os.stat(filename)
+        # files that fit into the head window are fully decoded either
+        # way; normalizing the flag lets the head-only check on
+        # drag-enter and the full read on drop share one cache entry
+        head_only = head_only and stat.st_size > HEAD_SIZE
+        text = _read_and_decode(filename, stat.st_mtime_ns, stat.st_size,
+                                head_only)
+        return text if limit is None else text[:limit]
     except (OSError, UnicodeDecodeError):
         return None
 
@@ -471,6 +544,7 @@ class OWPythonScript(OWWidget):
             setattr(self, name, {})
 
         self._cachedDocuments = {}
+        self._lastCode = (None, None)
 
         self.infoBox = gui.vBox(self.controlArea, 'Info')
         gui.label(
@@ -760,10 +834,27 @@ class OWPythonScript(OWWidget):
             {name: value for name, value in namespace.items()
              if name not in not_saved})
 
+    def codeForScript(self, script):
+        # `exec` accepts code objects, so repeated runs of unchanged script
+        # text skip recompilation; only the last script is remembered, as
+        # the target is clicking Run without editing in between. Source
+        # with syntax errors is kept as text so the console reports the
+        # error the same way as before
+        lastScript, lastCode = self._lastCode
+        if script != lastScript:
+            try:
+                lastCode = compile(script, "<script>", "exec")
+            except (SyntaxError, ValueError):
+                # source that cannot be compiled (including NUL bytes,
+                # which raise ValueError) is left to the console
+                lastCode = script
+            self._lastCode = (script, lastCode)
+        return lastCode
+
     def commit(self):
         self.Error.clear()
         lcls = self.initial_locals_state()
-        lcls["_script"] = str(self.text.toPlainText())
+        lcls["_script"] = self.codeForScript(str(self.text.toPlainText()))
         self.console.updateLocals(lcls)
         self.console.write("\nRunning script:\n")
         self.console.push("exec(_script)")
@@ -783,8 +874,17 @@ class OWPythonScript(OWWidget):
     def dragEnterEvent(self, event):  # pylint: disable=no-self-use
         urls = event.mimeData().urls()
         if urls:
-            # try reading the file as text
-            c = read_file_content(urls[0].toLocalFile(), limit=1000)
+            filename = urls[0].toLocalFile()
+            try:
+                with open(filename, "rb") as f:
+                    head = f.read(4096)
+            except OSError:
+                return
+            # cheap rejection of obvious binaries before full validation
+            if looks_binary(head):
+                return
+            # try reading the head of the file as text
+            c = read_file_content(filename, head_only=True)
             if c is not None:
                 event.acceptProposedAction()
 
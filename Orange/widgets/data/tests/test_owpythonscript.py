@@ -2,6 +2,7 @@
 # pylint: disable=missing-docstring
 import sys
 import unittest
+from functools import lru_cache
 
 from AnyQt.QtCore import QMimeData, QUrl, QPoint, Qt
 from AnyQt.QtGui import QDragEnterEvent, QDropEvent
@@ -10,33 +11,84 @@ from Orange.data import Table
 from Orange.classification import LogisticRegressionLearner
 from Orange.tests import named_file
 from Orange.widgets.data.owpythonscript import OWPythonScript, \
-    read_file_content, Script, OWPythonScriptDropHandler
+    read_file_content, Script, OWPythonScriptDropHandler, HEAD_SIZE
 from Orange.widgets.tests.base import WidgetTest, DummySignalManager
 from Orange.widgets.widget import OWWidget
 
 
-class TestOWPythonScript(WidgetTest):
+# script snippets used by the execution tests, built once so the test
+# loops do not re-run the format parser and the widget's code cache hits
+COPY_SCRIPTS = {name: "out_{0} = in_{0}".format(name)
+                for name in ("data", "learner", "classifier")}
+PRINT_SCRIPTS = {name: "print(in_{})".format(name)
+                 for name in ("data", "learner", "classifier")}
+WRONG_SCRIPTS = {name: "out_{} = 42".format(name)
+                 for name in ("data", "learner", "classifier")}
+
+
+@lru_cache(maxsize=1)
+def _fixtures():
+    # loaded and fitted once per process; the test classes below only
+    # compare these by identity, so sharing the instances is safe
+    iris = Table("iris")
+    learner = LogisticRegressionLearner()
+    return iris, learner, learner(iris)
+
+
+class PythonScriptTestMixin:
+    """Shared fixture of the OWPythonScript test groups.
+
+    The tests are grouped into separate classes so that distributing
+    runners (e.g. pytest-xdist with loadscope) can schedule the groups
+    on separate workers. A mixin rather than a common WidgetTest
+    subclass, so that it is not collected as a test class of its own.
+    """
+    _widget = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.iris, cls.learner, cls.model = _fixtures()
+
     def setUp(self):
-        self.widget = self.create_widget(OWPythonScript)
-        self.iris = Table("iris")
-        self.learner = LogisticRegressionLearner()
-        self.model = self.learner(self.iris)
+        # constructing the widget is by far the most expensive part of the
+        # fixture, so one instance is shared by all tests and reset here;
+        # tests that need a fresh widget call create_widget themselves
+        cls = type(self)
+        if cls._widget is None:
+            cls._widget = self.create_widget(OWPythonScript)
+        self.widget = cls._widget
+        del self.widget.libraryList[1:]
+        self.widget.setSelectedScript(0)
+        self.widget.restoreSaved()
+        for name in self.widget.signal_names:
+            getattr(self.widget, name).clear()
+        self.widget.Error.clear()
 
     def tearDown(self):
-        # clear sys.last_*, these are set/used by interactive interpreter
-        sys.last_type = sys.last_value = sys.last_traceback = None
+        # clear sys.last_*, these are set/used by interactive interpreter;
+        # only write them back when a script actually raised
+        if getattr(sys, "last_traceback", None) is not None:
+            sys.last_type = sys.last_value = sys.last_traceback = None
         super().tearDown()
 
+
+class TestOWPythonScriptExec(PythonScriptTestMixin, WidgetTest):
     def test_inputs(self):
         """Check widget's inputs"""
-        for input_, data in (("Data", self.iris),
-                             ("Learner", self.learner),
-                             ("Classifier", self.model),
-                             ("Object", "object")):
+        signals = (("Data", self.iris),
+                   ("Learner", self.learner),
+                   ("Classifier", self.model),
+                   ("Object", "object"))
+        for input_, _ in signals:
             self.assertEqual(getattr(self.widget, input_.lower()), {})
-            self.send_signal(input_, data, 1)
+        # batch the sends so the signal round-trip is paid once per phase
+        # instead of once per input
+        self.send_signals([(input_, data) for input_, data in signals], 1)
+        for input_, data in signals:
             self.assertEqual(getattr(self.widget, input_.lower()), {1: data})
-            self.send_signal(input_, None, 1)
+        self.send_signals([(input_, None) for input_, _ in signals], 1)
+        for input_, _ in signals:
             self.assertEqual(getattr(self.widget, input_.lower()), {})
 
     def test_outputs(self):
@@ -46,11 +98,11 @@ class TestOWPythonScript(WidgetTest):
                 ("Learner", self.learner),
                 ("Classifier", self.model)):
             lsignal = signal.lower()
-            self.widget.text.setPlainText("out_{0} = in_{0}".format(lsignal))
+            self.widget.text.setPlainText(COPY_SCRIPTS[lsignal])
             self.send_signal(signal, data, 1)
             self.assertIs(self.get_output(signal), data)
             self.send_signal(signal, None, 1)
-            self.widget.text.setPlainText("print(in_{})".format(lsignal))
+            self.widget.text.setPlainText(PRINT_SCRIPTS[lsignal])
             self.widget.execute_button.click()
             self.assertIsNone(self.get_output(signal))
 
@@ -76,55 +128,81 @@ class TestOWPythonScript(WidgetTest):
                 ("Classifier", self.model)):
             lsignal = signal.lower()
             self.send_signal(signal, data, 1)
-            self.widget.text.setPlainText("out_{} = 42".format(lsignal))
+            self.widget.text.setPlainText(WRONG_SCRIPTS[lsignal])
             self.widget.execute_button.click()
             self.assertEqual(self.get_output(signal), None)
             self.assertTrue(hasattr(self.widget.Error, lsignal))
             self.assertTrue(getattr(self.widget.Error, lsignal).is_shown())
 
-            self.widget.text.setPlainText("out_{0} = in_{0}".format(lsignal))
+            self.widget.text.setPlainText(COPY_SCRIPTS[lsignal])
             self.widget.execute_button.click()
             self.assertIs(self.get_output(signal), data)
             self.assertFalse(getattr(self.widget.Error, lsignal).is_shown())
 
-    def test_owns_errors(self):
-        self.assertIsNot(self.widget.Error, OWWidget.Error)
-
     def test_multiple_signals(self):
         click = self.widget.execute_button.click
         console_locals = self.widget.console.locals
 
         titanic = Table("titanic")
 
+        def snap():
+            # the data bindings made by the last run; tables have no
+            # __eq__, so comparing snapshots compares identities
+            return {"in_data": console_locals["in_data"],
+                    "in_datas": list(console_locals["in_datas"])}
+
+        no_data = {"in_data": None, "in_datas": []}
+        only_iris = {"in_data": self.iris, "in_datas": [self.iris]}
+
         click()
-        self.assertIsNone(console_locals["in_data"])
-        self.assertEqual(console_locals["in_datas"], [])
+        self.assertEqual(snap(), no_data)
 
         self.send_signal("Data", self.iris, 1)
         click()
-        self.assertIs(console_locals["in_data"], self.iris)
-        datas = console_locals["in_datas"]
-        self.assertEqual(len(datas), 1)
-        self.assertIs(datas[0], self.iris)
+        self.assertEqual(snap(), only_iris)
 
         self.send_signal("Data", titanic, 2)
         click()
-        self.assertIsNone(console_locals["in_data"])
-        self.assertEqual({id(obj) for obj in console_locals["in_datas"]},
-                         {id(self.iris), id(titanic)})
+        self.assertEqual(snap(), {"in_data": None,
+                                  "in_datas": [self.iris, titanic]})
 
         self.send_signal("Data", None, 2)
         click()
-        self.assertIs(console_locals["in_data"], self.iris)
-        datas = console_locals["in_datas"]
-        self.assertEqual(len(datas), 1)
-        self.assertIs(datas[0], self.iris)
+        self.assertEqual(snap(), only_iris)
 
         self.send_signal("Data", None, 1)
         click()
-        self.assertIsNone(console_locals["in_data"])
-        self.assertEqual(console_locals["in_datas"], [])
+        self.assertEqual(snap(), no_data)
+
+    def test_shared_namespaces(self):
+        widget1 = self.create_widget(OWPythonScript)
+        widget2 = self.create_widget(OWPythonScript)
+        self.signal_manager = DummySignalManager()
+        widget3 = self.create_widget(OWPythonScript)
+
+        self.send_signal(widget1.Inputs.data, self.iris, 1, widget=widget1)
+        widget1.text.setPlainText("x = 42\n"
+                                  "out_data = in_data\n")
+        widget1.execute_button.click()
+        self.assertIs(
+            self.get_output(widget1.Outputs.data, widget=widget1),
+            self.iris)
 
+        widget2.text.setPlainText("out_object = 2 * x\n"
+                                  "out_data = in_data")
+        widget2.execute_button.click()
+        self.assertEqual(
+            self.get_output(widget1.Outputs.object, widget=widget2),
+            84)
+        self.assertIsNone(self.get_output(widget1.Outputs.data, widget=widget2))
+
+        sys.last_traceback = None
+        widget3.text.setPlainText("out_object = 2 * x")
+        widget3.execute_button.click()
+        self.assertIsNotNone(sys.last_traceback)
+
+
+class TestOWPythonScriptLibrary(PythonScriptTestMixin, WidgetTest):
     def test_store_new_script(self):
         self.widget.text.setPlainText("42")
         self.widget.onAddScript()
@@ -148,6 +226,22 @@ class TestOWPythonScript(WidgetTest):
         script = self.widget.text.toPlainText()
         self.assertEqual("42", script)
 
+    def test_migrate(self):
+        w = self.create_widget(OWPythonScript, {
+            "libraryListSource": [Script("A", "1")],
+            "__version__": 0
+        })
+        self.assertEqual(w.libraryListSource[0].name, "A")
+
+    def test_restore(self):
+        w = self.create_widget(OWPythonScript, {
+            "scriptLibrary": [dict(name="A", script="1", filename=None)],
+            "__version__": 2
+        })
+        self.assertEqual(w.libraryListSource[0].name, "A")
+
+
+class TestOWPythonScriptIO(PythonScriptTestMixin, WidgetTest):
     def test_read_file_content(self):
         with named_file("Content", suffix=".42") as fn:
             # valid file opens
@@ -159,6 +253,15 @@ class TestOWPythonScript(WidgetTest):
             content = read_file_content(fn)
             self.assertIsNone(content)
 
+    def test_read_file_content_head_only(self):
+        # the head-only check deliberately ignores invalid bytes past the
+        # validated window; the full read still rejects them
+        with named_file("", suffix=".42") as fn:
+            with open(fn, "wb") as f:
+                f.write(b"a" * HEAD_SIZE + b"\xc3\x28")
+            self.assertIsNotNone(read_file_content(fn, head_only=True))
+            self.assertIsNone(read_file_content(fn))
+
     def test_script_insert_mime_text(self):
         current = self.widget.text.toPlainText()
         insert = "test\n"
@@ -194,6 +297,23 @@ class TestOWPythonScript(WidgetTest):
             self.widget.dragEnterEvent(event)
             self.assertFalse(event.isAccepted())
 
+    def test_dragEnterEvent_rejects_magic(self):
+        with named_file("", suffix=".42") as fn:
+            with open(fn, "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n and image data")
+            event = self._drag_enter_event(QUrl.fromLocalFile(fn))
+            self.widget.dragEnterEvent(event)
+            self.assertFalse(event.isAccepted())
+
+    def test_dragEnterEvent_rejects_nul(self):
+        # a NUL byte is valid UTF-8, but no text script contains one
+        with named_file("", suffix=".42") as fn:
+            with open(fn, "wb") as f:
+                f.write(b"looks like text\x00but is not")
+            event = self._drag_enter_event(QUrl.fromLocalFile(fn))
+            self.widget.dragEnterEvent(event)
+            self.assertFalse(event.isAccepted())
+
     def _drag_enter_event(self, url):
         # make sure data does not get garbage collected before it used
         # pylint: disable=attribute-defined-outside-init
@@ -222,46 +342,12 @@ class TestOWPythonScript(WidgetTest):
             QPoint(0, 0), Qt.MoveAction, data,
             Qt.NoButton, Qt.NoModifier, QDropEvent.Drop)
 
-    def test_shared_namespaces(self):
-        widget1 = self.create_widget(OWPythonScript)
-        widget2 = self.create_widget(OWPythonScript)
-        self.signal_manager = DummySignalManager()
-        widget3 = self.create_widget(OWPythonScript)
 
-        self.send_signal(widget1.Inputs.data, self.iris, 1, widget=widget1)
-        widget1.text.setPlainText("x = 42\n"
-                                  "out_data = in_data\n")
-        widget1.execute_button.click()
-        self.assertIs(
-            self.get_output(widget1.Outputs.data, widget=widget1),
-            self.iris)
+class TestOWPythonScriptClass(unittest.TestCase):
+    # checks of class-level attributes that need no widget instance
 
-        widget2.text.setPlainText("out_object = 2 * x\n"
-                                  "out_data = in_data")
-        widget2.execute_button.click()
-        self.assertEqual(
-            self.get_output(widget1.Outputs.object, widget=widget2),
-            84)
-        self.assertIsNone(self.get_output(widget1.Outputs.data, widget=widget2))
-
-        sys.last_traceback = None
-        widget3.text.setPlainText("out_object = 2 * x")
-        widget3.execute_button.click()
-        self.assertIsNotNone(sys.last_traceback)
-
-    def test_migrate(self):
-        w = self.create_widget(OWPythonScript, {
-            "libraryListSource": [Script("A", "1")],
-            "__version__": 0
-        })
-        self.assertEqual(w.libraryListSource[0].name, "A")
-
-    def test_restore(self):
-        w = self.create_widget(OWPythonScript, {
-            "scriptLibrary": [dict(name="A", script="1", filename=None)],
-            "__version__": 2
-        })
-        self.assertEqual(w.libraryListSource[0].name, "A")
+    def test_owns_errors(self):
+        self.assertIsNot(OWPythonScript.Error, OWWidget.Error)
 
 
 class TestOWPythonScriptDropHandler(unittest.TestCase):